@@ -1,170 +1,291 @@
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+from joblib import parallel_backend
+from sklearn import config_context
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
-def detect_outliers_univariate_zscore(df, z_thresh=3.0):
-    """Detect outliers using Z-score method. Handles constant columns."""
-    df_num = df.select_dtypes(include=[np.number])
-    if df_num.shape[1] == 0:
-        return None
-    
-    # Calculate std, handle zero std
-    std = df_num.std(ddof=0)
-    std = std.replace(0, np.nan)  # Replace 0 std with NaN to avoid division by zero
-    
-    z = (df_num - df_num.mean()) / std
-    z = z.fillna(0)  # Fill NaN (from constant columns) with 0
-    
-    return (z.abs() > z_thresh)
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:  # numba is optional; the NumPy kernels below are used instead
+    _HAS_NUMBA = False
 
-def detect_outliers_iqr(df, factor=1.5):
-    """Detect outliers using IQR method. Handles edge cases."""
-    df_num = df.select_dtypes(include=[np.number])
-    if df_num.shape[1] == 0:
-        return None
-    
-    Q1 = df_num.quantile(0.25)
-    Q3 = df_num.quantile(0.75)
-    IQR = Q3 - Q1
-    
-    # Handle zero IQR (constant columns)
-    IQR = IQR.replace(0, np.nan)
-    
-    lower = Q1 - factor * IQR
-    upper = Q3 + factor * IQR
-    
-    outliers = (df_num < lower) | (df_num > upper)
-    return outliers.fillna(False)
+if _HAS_NUMBA:
+    # No fastmath on these kernels: it lets LLVM assume there are no NaNs,
+    # and missing cells are NaN here. No parallel=True either: detect_all runs
+    # on worker threads (asyncio.to_thread), and numba's threading layers
+    # abort or hang when entered from concurrent or non-main threads
+    @njit(cache=True)
+    def _zscore_mask_numba(X, thresh):
+        """Per-column Welford mean/variance over non-missing cells, then the |z| > thresh mask."""
+        n, d = X.shape
+        out = np.empty((n, d), dtype=np.bool_)
+        for j in range(d):
+            mean = 0.0
+            m2 = 0.0
+            k = 0
+            for i in range(n):
+                x = X[i, j]
+                if np.isnan(x):
+                    continue
+                k += 1
+                delta = x - mean
+                mean += delta / k
+                m2 += delta * (x - mean)
+            cut = thresh * np.sqrt(m2 / k)
+            for i in range(n):
+                out[i, j] = abs(X[i, j] - mean) > cut
+        return out
 
-def detect_multivariate_outliers_iforest(df, contamination=0.01, random_state=0):
-    df_num = df.select_dtypes(include=[np.number]).fillna(0)
-    if df_num.shape[1] == 0:
-        return None
-    clf = IsolationForest(contamination=contamination, random_state=random_state)
-    clf.fit(df_num.values)
-    preds = clf.predict(df_num.values)  
-    return pd.Series(preds == -1, index=df.index, name='anomaly_iforest')
+    @njit(cache=True)
+    def _linear_quantile_numba(col, q):
+        """Linear-interpolated quantile (same as np.percentile) via one partition."""
+        n = col.shape[0]
+        h = (n - 1) * q
+        lo = int(np.floor(h))
+        part = np.partition(col, lo)
+        value = part[lo]
+        if lo + 1 < n:
+            value += (h - lo) * (part[lo + 1:].min() - value)
+        return value
 
-def detect_multivariate_outliers_iforest(df, contamination=0.01, random_state=0):
-    """Detect multivariate outliers using Isolation Forest. Robust to dirty data."""
+    @njit(cache=True)
+    def _iqr_mask_numba(X, factor):
+        """Per-column Q1/Q3 of the non-missing cells by partitioning, then the IQR fence mask."""
+        n, d = X.shape
+        out = np.empty((n, d), dtype=np.bool_)
+        for j in range(d):
+            col = X[:, j]
+            col = col[~np.isnan(col)]
+            q1 = _linear_quantile_numba(col, 0.25)
+            q3 = _linear_quantile_numba(col, 0.75)
+            iqr = q3 - q1
+            lower = q1 - factor * iqr
+            upper = q3 + factor * iqr
+            for i in range(n):
+                out[i, j] = iqr != 0 and (X[i, j] < lower or X[i, j] > upper)
+        return out
+
+def _prepare_numeric_matrix(df, fill_missing=True):
+    """
+    Build the cleaned float64 numeric matrix shared by the detectors.
+    Returns the matrix with constant columns dropped, and a boolean mask over
+    the numeric columns marking the ones that were kept. With fill_missing (the multivariate detectors)
+    NaN/inf become 0; without it (Z-score and IQR) they become NaN, so missing
+    cells are skipped by the statistics and never flagged. The matrix stays in
+    float64 so that large, finely spaced values (timestamps, IDs) keep their
+    spread; Isolation Forest and the cluster detector take float32 copies themselves.
+    """
     df_num = df.select_dtypes(include=[np.number])
     
-    if df_num.shape[1] == 0:
-        return None
-    
-    # Handle missing values and infinite values
-    df_num = df_num.replace([np.inf, -np.inf], np.nan)
-    df_num = df_num.fillna(0)
-    
-    # Remove constant columns (zero variance)
-    df_num = df_num.loc[:, df_num.std() > 0]
-    
-    if df_num.shape[1] == 0:
-        return None
+    # One owned copy; NaN/inf are then cleaned in place
+    X = df_num.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    if X.shape[0] == 0:
+        keep = np.zeros(X.shape[1], dtype=bool)
+    elif fill_missing:
+        np.nan_to_num(X, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        # Remove constant columns; a single min/max pass instead of computing a variance
+        keep = np.ptp(X, axis=0) > 0
+    else:
+        finite = np.isfinite(X)
+        X[~finite] = np.nan
+        # Columns with fewer than two distinct non-missing values are constant
+        keep = (np.where(finite, X, -np.inf).max(axis=0)
+                > np.where(finite, X, np.inf).min(axis=0))
+    return X[:, keep], keep
+
+def _zscore_core(X, z_thresh=3.0):
+    """Z-score outlier mask for a NaN-preserving prepared matrix. NaN cells are never flagged."""
+    if _HAS_NUMBA:
+        return _zscore_mask_numba(X, z_thresh)
+    
+    mean = np.nanmean(X, axis=0)
+    std = np.nanstd(X, axis=0, ddof=0)
+    return np.abs(X - mean) > z_thresh * std
+
+def _iqr_core(X, factor=1.5):
+    """
+    IQR outlier mask for a NaN-preserving prepared matrix.
+    NaN cells and zero-IQR columns are never flagged.
+    """
+    if _HAS_NUMBA:
+        return _iqr_mask_numba(X, factor)
+    
+    if np.isnan(X).any():
+        Q1, Q3 = np.nanpercentile(X, [25, 75], axis=0)
+    else:
+        # Both quartiles from one partition (O(N) per column) instead of sorting.
+        # Partitioning the neighbouring order statistics too keeps np.percentile's interpolation.
+        n = X.shape[0]
+        h1, h3 = 0.25 * (n - 1), 0.75 * (n - 1)
+        lo1, lo3 = int(h1), int(h3)
+        hi1, hi3 = min(lo1 + 1, n - 1), min(lo3 + 1, n - 1)
+        part = np.partition(X, sorted({lo1, hi1, lo3, hi3}), axis=0)
+        Q1 = part[lo1] + (h1 - lo1) * (part[hi1] - part[lo1])
+        Q3 = part[lo3] + (h3 - lo3) * (part[hi3] - part[lo3])
+    IQR = Q3 - Q1
     
+    outliers = (X < Q1 - factor * IQR) | (X > Q3 + factor * IQR)
+    outliers[:, IQR == 0] = False
+    return outliers
+
+def _iforest_core(X, contamination=0.01, random_state=0):
+    """Isolation Forest on a prepared matrix. Returns a boolean array or None."""
     # Ensure we have enough samples
-    n_samples = len(df_num)
+    n_samples = X.shape[0]
     if n_samples < 2:
-        return pd.Series([False] * n_samples, index=df.index, name='anomaly_iforest')
+        return np.zeros(n_samples, dtype=bool)
     
     try:
-        clf = IsolationForest(contamination=contamination, random_state=random_state)
-        clf.fit(df_num.values)
-        preds = clf.predict(df_num.values)
-        return pd.Series(preds == -1, index=df.index, name='anomaly_iforest')
+        clf = IsolationForest(contamination=contamination, random_state=random_state, n_jobs=-1)
+        # One C-contiguous float32 handle for both fit and predict, so sklearn
+        # never re-copies it; X is already NaN/inf-free, so skip the finiteness scans
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with config_context(assume_finite=True):
+            clf.fit(X)
+            # Tree scoring in predict only runs in parallel under a threading backend
+            with parallel_backend('threading', n_jobs=-1):
+                preds = clf.predict(X)
+        return preds == -1
     except Exception as e:
         print(f"Warning: Isolation Forest failed: {e}")
         return None
 
-def detect_local_density_outliers_lof(df, n_neighbors=20, contamination='auto'):
-    """Detect outliers using Local Outlier Factor. Robust to dirty data."""
-    df_num = df.select_dtypes(include=[np.number])
-    
-    if df_num.shape[1] == 0:
-        return None
-    
-    # Handle missing and infinite values
-    df_num = df_num.replace([np.inf, -np.inf], np.nan)
-    df_num = df_num.fillna(0)
-    
-    # Remove constant columns
-    df_num = df_num.loc[:, df_num.std() > 0]
-    
-    if df_num.shape[1] == 0:
-        return None
-    
+def _lof_core(X, n_neighbors=20, contamination='auto'):
+    """Local Outlier Factor on a prepared matrix. Returns a boolean array or None."""
     # Ensure n_neighbors is valid
-    n_samples = len(df_num)
+    n_samples = X.shape[0]
     if n_samples < 2:
-        return pd.Series([False] * n_samples, index=df.index, name='anomaly_lof')
+        return np.zeros(n_samples, dtype=bool)
     
     n_neighbors = min(n_neighbors, n_samples - 1)
     
+    # Tree indexes pay off for moderate dimensionality; tiny inputs just use brute force
+    if n_samples < 2 * n_neighbors:
+        algorithm = 'brute'
+    elif X.shape[1] <= 20:
+        algorithm = 'kd_tree'
+    else:
+        algorithm = 'ball_tree'
+    
     try:
-        lof = LocalOutlierFactor(n_neighbors=n_neighbors, contamination=contamination)
-        preds = lof.fit_predict(df_num.values)
-        return pd.Series(preds == -1, index=df.index, name='anomaly_lof')
+        lof = LocalOutlierFactor(n_neighbors=n_neighbors, contamination=contamination,
+                                 algorithm=algorithm, leaf_size=40, n_jobs=-1)
+        # Unscaled float64: the neighbour trees work in float64 anyway, and a
+        # float32 copy would flatten large, finely spaced columns
+        with config_context(assume_finite=True):
+            preds = lof.fit_predict(X)
+        return preds == -1
     except Exception as e:
         print(f"Warning: LOF failed: {e}")
         return None
 
-def detect_cluster_distance_outliers(df, n_clusters=5, threshold_percentile=95):
-    df_num = df.select_dtypes(include=[np.number]).fillna(0)
-    if df_num.shape[1] == 0 or len(df_num) < n_clusters:
-        return None
-    scaler = StandardScaler()
-    X = scaler.fit_transform(df_num.values)
-    kmeans = KMeans(n_clusters=n_clusters, random_state=0)
-    labels = kmeans.fit_predict(X)
-    centroids = kmeans.cluster_centers_
-    dists = np.linalg.norm(X - centroids[labels], axis=1)
-    threshold = np.percentile(dists, threshold_percentile)
-    return pd.Series(dists > threshold, index=df.index, name='anomaly_cluster_dist')
-
-def detect_cluster_distance_outliers(df, n_clusters=5, threshold_percentile=95):
-    """Detect outliers using K-Means cluster distance. Robust to dirty data."""
-    df_num = df.select_dtypes(include=[np.number])
-    
-    if df_num.shape[1] == 0:
-        return None
-    
-    # Handle missing and infinite values
-    df_num = df_num.replace([np.inf, -np.inf], np.nan)
-    df_num = df_num.fillna(0)
-    
-    # Remove constant columns
-    df_num = df_num.loc[:, df_num.std() > 0]
-    
-    if df_num.shape[1] == 0:
-        return None
-    
+def _cluster_distance_core(X, n_clusters=5, threshold_percentile=95):
+    """K-Means cluster distance on a prepared matrix. Returns a boolean array or None."""
     # Ensure we have enough samples
-    n_samples = len(df_num)
+    n_samples = X.shape[0]
     if n_samples < n_clusters:
         n_clusters = max(2, n_samples // 2)  # Use fewer clusters if needed
     
     if n_samples < 2:
-        return pd.Series([False] * n_samples, index=df.index, name='anomaly_cluster_dist')
+        return np.zeros(n_samples, dtype=bool)
     
     try:
-        scaler = StandardScaler()
-        X = scaler.fit_transform(df_num.values)
+        # Standardize in float64 (X itself is shared with other detectors), then
+        # drop to float32 once the columns are on a unit scale
+        mu = X.mean(axis=0, keepdims=True)
+        sd = X.std(axis=0, keepdims=True)
+        sd[sd == 0] = 1.0
+        X = np.subtract(X, mu)
+        np.divide(X, sd, out=X)
+        X = X.astype(np.float32)
         
-        kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init=10)
-        labels = kmeans.fit_predict(X)
+        # A coarse clustering is enough for a percentile cut on distances:
+        # one k-means++ init, Elkan's triangle-inequality updates, mini-batches on large inputs
+        if n_samples > 50_000:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=0, n_init=1, batch_size=4096)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init=1,
+                            algorithm='elkan', max_iter=100, tol=1e-3)
+        with config_context(assume_finite=True):
+            labels = kmeans.fit_predict(X)
         centroids = kmeans.cluster_centers_
         
-        dists = np.linalg.norm(X - centroids[labels], axis=1)
-        threshold = np.percentile(dists, threshold_percentile)
+        # ||x - c||^2 = x.x + c.c - 2 x.c, using an N x k cross term instead of
+        # an N x D difference array. Squaring is monotonic, so the percentile
+        # cut flags the same rows as it would on plain distances.
+        cross = np.take_along_axis(X @ centroids.T, labels[:, None], axis=1)[:, 0]
+        dists_sq = (np.einsum('ij,ij->i', X, X)
+                    + np.einsum('ij,ij->i', centroids, centroids)[labels]
+                    - 2 * cross)
+        threshold_sq = np.percentile(dists_sq, threshold_percentile)
         
-        return pd.Series(dists > threshold, index=df.index, name='anomaly_cluster_dist')
+        return dists_sq > threshold_sq
     except Exception as e:
         print(f"Warning: Cluster distance failed: {e}")
         return None
 
+def _univariate_outliers(df, core, **params):
+    """
+    Per-column mask from a univariate core over every numeric column of df.
+    Constant columns are left out of the statistics and come back all False.
+    """
+    cols = df.select_dtypes(include=[np.number]).columns
+    if len(cols) == 0:
+        return None
+    X, keep = _prepare_numeric_matrix(df, fill_missing=False)
+    out = np.zeros((len(df), len(cols)), dtype=bool)
+    if X.shape[1] > 0:
+        out[:, keep] = core(X, **params)
+    return pd.DataFrame(out, index=df.index, columns=cols)
+
+def detect_outliers_univariate_zscore(df, z_thresh=3.0):
+    """Detect outliers using Z-score method. Handles constant columns."""
+    return _univariate_outliers(df, _zscore_core, z_thresh=z_thresh)
+
+def detect_outliers_iqr(df, factor=1.5):
+    """Detect outliers using IQR method. Handles edge cases."""
+    return _univariate_outliers(df, _iqr_core, factor=factor)
+
+def detect_multivariate_outliers_iforest(df, contamination=0.01, random_state=0):
+    """Detect multivariate outliers using Isolation Forest. Robust to dirty data."""
+    X, _ = _prepare_numeric_matrix(df)
+    if X.shape[1] == 0:
+        return None
+    preds = _iforest_core(X, contamination, random_state)
+    if preds is None:
+        return None
+    return pd.Series(preds, index=df.index, name='anomaly_iforest')
+
+def detect_local_density_outliers_lof(df, n_neighbors=20, contamination='auto'):
+    """Detect outliers using Local Outlier Factor. Robust to dirty data."""
+    X, _ = _prepare_numeric_matrix(df)
+    if X.shape[1] == 0:
+        return None
+    preds = _lof_core(X, n_neighbors, contamination)
+    if preds is None:
+        return None
+    return pd.Series(preds, index=df.index, name='anomaly_lof')
+
+def detect_cluster_distance_outliers(df, n_clusters=5, threshold_percentile=95):
+    """Detect outliers using K-Means cluster distance. Robust to dirty data."""
+    X, _ = _prepare_numeric_matrix(df)
+    if X.shape[1] == 0:
+        return None
+    preds = _cluster_distance_core(X, n_clusters, threshold_percentile)
+    if preds is None:
+        return None
+    return pd.Series(preds, index=df.index, name='anomaly_cluster_dist')
+
+def _univariate_any(X, core, **params):
+    """Rows where a univariate core flags any column; all False when X has no columns."""
+    if X.shape[1] == 0:
+        return np.zeros(X.shape[0], dtype=bool)
+    return core(X, **params).any(axis=1)
+
 def detect_all(df):
     """
     Run all anomaly detection methods on the dataframe.
@@ -175,57 +296,60 @@ def detect_all(df):
     
     results = {}
     
-    # Z-score detection
-    try:
-        z = detect_outliers_univariate_zscore(df, z_thresh=3.0)
-        if z is not None and not z.empty:
-            results['outlier_zscore'] = z.any(axis=1)  # Any column flagged
-    except Exception as e:
-        print(f"Warning: Z-score detection failed: {e}")
-    
-    # IQR detection
-    try:
-        iqr = detect_outliers_iqr(df, factor=1.5)
-        if iqr is not None and not iqr.empty:
-            results['outlier_iqr'] = iqr.any(axis=1)  # Any column flagged
-    except Exception as e:
-        print(f"Warning: IQR detection failed: {e}")
-    
-    # Isolation Forest
-    try:
-        iso = detect_multivariate_outliers_iforest(df, contamination=0.01, random_state=0)
-        if iso is not None:
-            results['anomaly_iforest'] = iso
-    except Exception as e:
-        print(f"Warning: Isolation Forest detection failed: {e}")
-    
-    # Local Outlier Factor
-    try:
-        lof = detect_local_density_outliers_lof(df, n_neighbors=20, contamination='auto')
-        if lof is not None:
-            results['anomaly_lof'] = lof
-    except Exception as e:
-        print(f"Warning: LOF detection failed: {e}")
-    
-    # Cluster distance
-    try:
-        clust = detect_cluster_distance_outliers(df, n_clusters=5, threshold_percentile=95)
-        if clust is not None:
-            results['anomaly_cluster_dist'] = clust
-    except Exception as e:
-        print(f"Warning: Cluster distance detection failed: {e}")
+    # Clean the numeric data once per flavour: zero-filled for the multivariate
+    # detectors, NaN-preserving for the univariate ones
+    has_numeric = df.select_dtypes(include=[np.number]).shape[1] > 0
+    X, _ = _prepare_numeric_matrix(df)
+    X_nan, _ = _prepare_numeric_matrix(df, fill_missing=False)
+    
+    # The sklearn detectors are independent and spend their time in C code
+    # that releases the GIL, so they run side by side on a thread pool
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = []
+        if X.shape[1] > 0:
+            futures = [
+                ('anomaly_iforest', 'Isolation Forest',
+                 executor.submit(_iforest_core, X, contamination=0.01, random_state=0)),
+                ('anomaly_lof', 'LOF',
+                 executor.submit(_lof_core, X, n_neighbors=20, contamination='auto')),
+                ('anomaly_cluster_dist', 'Cluster distance',
+                 executor.submit(_cluster_distance_core, X, n_clusters=5, threshold_percentile=95)),
+            ]
+        
+        # Z-score and IQR are cheap single-pass kernels; run them here while the
+        # pool works. Like the per-column detectors they report on any numeric
+        # data, flagging nothing when every column is constant
+        if has_numeric:
+            try:
+                results['outlier_zscore'] = _univariate_any(X_nan, _zscore_core, z_thresh=3.0)
+            except Exception as e:
+                print(f"Warning: Z-score detection failed: {e}")
+            
+            try:
+                results['outlier_iqr'] = _univariate_any(X_nan, _iqr_core, factor=1.5)
+            except Exception as e:
+                print(f"Warning: IQR detection failed: {e}")
+        
+        for name, label, future in futures:
+            try:
+                preds = future.result()
+                if preds is not None:
+                    results[name] = preds
+            except Exception as e:
+                print(f"Warning: {label} detection failed: {e}")
     
     # If no methods succeeded, return empty dataframe with anomaly_any column
     if not results:
-        return pd.DataFrame({'anomaly_any': [False] * len(df)}, index=df.index)
-    
-    res_df = pd.DataFrame(results, index=df.index)
+        return pd.DataFrame({'anomaly_any': np.zeros(len(df), dtype=bool)}, index=df.index)
     
-    # Fill any NaN values with False
-    res_df = res_df.fillna(False)
+    # Stack the boolean flags once and count votes in NumPy
+    mat = np.column_stack(list(results.values()))
     
     # Mark as anomaly if at least 2 methods agree
-    res_df['anomaly_any'] = res_df.sum(axis=1) >= 2
+    any_anom = np.count_nonzero(mat, axis=1) >= 2
+    
+    res_df = pd.DataFrame(mat, columns=list(results), index=df.index)
+    res_df['anomaly_any'] = any_anom
     
     return res_df
     
@@ -1,11 +1,51 @@
 import os
+import datetime
 import pandas as pd
 import sqlite3
-def load_file(path, **kwargs):
+def shrink_numeric(df):
+    """
+    Downcast integer columns in place to the narrowest integer type that holds them.
+    Floats are left as float64: pandas accumulates means and sums in the column's
+    own float type, so float32 columns would shift the reported statistics.
+    """
+    for col in df.select_dtypes(include=['integer']).columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+def _has_arrow_dates(df):
+    """
+    True when the pyarrow engine inferred date, time or timestamp columns,
+    which the default C parser would have left as text.
+    """
+    if len(df.select_dtypes(include=['datetime', 'datetimetz']).columns) > 0:
+        return True
+    for col in df.select_dtypes(include=['object']).columns:
+        first = df[col].first_valid_index()
+        if first is not None and isinstance(df[col].at[first], (datetime.date, datetime.time)):
+            return True
+    return False
+def _has_raw_headers(df):
+    """
+    True when the pyarrow engine kept duplicate or empty header names, which
+    the default C parser would have renamed ('a.1', 'Unnamed: 2').
+    """
+    return bool(df.columns.duplicated().any() or (df.columns == '').any())
+def load_file(path, downcast=True, **kwargs):
     _, ext = os.path.splitext(path)
     ext = ext.lower()
     if ext == '.csv':
-        df = pd.read_csv(path, **kwargs)
+        try:
+            # Multi-threaded Arrow parser; needs pyarrow and only supports a subset of options
+            df = pd.read_csv(path, engine='pyarrow', **kwargs)
+            if _has_arrow_dates(df) or _has_raw_headers(df):
+                # Arrow cannot be told to keep date-like text or to rename headers
+                # the way the C parser does, so such files are parsed a second time
+                df = None
+        except Exception:
+            df = None
+        if df is None:
+            df = pd.read_csv(path, memory_map=True, **kwargs)
+        if downcast:
+            df = shrink_numeric(df)
         return df
     elif ext in ('.db', '.sqlite', '.sql'):
         conn = sqlite3.connect(path)
@@ -14,7 +54,16 @@ def load_file(path, **kwargs):
         tables = [row[0] for row in cursor.fetchall()]
         dfs = {}
         for tbl in tables:
-            dfs[tbl] = pd.read_sql_query(f"SELECT * FROM {tbl}", conn)
+            # Stream each table in bounded chunks, shrinking every chunk before it is kept
+            quoted = '"' + tbl.replace('"', '""') + '"'
+            chunks = pd.read_sql_query(f"SELECT * FROM {quoted}", conn, chunksize=100_000)
+            if downcast:
+                chunks = (shrink_numeric(chunk) for chunk in chunks)
+            df = pd.concat(chunks, ignore_index=True)
+            # A column that is all NULL in one chunk comes back as object and
+            # drags the whole column to object in the concat; re-infer it
+            df = df.infer_objects()
+            dfs[tbl] = shrink_numeric(df) if downcast else df
         conn.close()
         return dfs
     else:
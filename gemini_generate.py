@@ -1,18 +1,27 @@
 # gemini_client.py
+import functools
 import os
 from google import genai
 
+@functools.lru_cache(maxsize=1)
+def _client(api_key: str):
+    # One client (and its connection pool) per process, rebuilt only if the key changes
+    return genai.Client(api_key=api_key)
+
+@functools.lru_cache(maxsize=None)
+def _generate_config(thinking_budget: int):
+    from google.genai import types
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget)
+    )
+
 def ask_gemini(prompt: str, model: str = "gemini-2.5-flash", thinking_budget: int = None) -> str:
-    # Create client with API key
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-    
+    client = _client(os.getenv("GEMINI_API_KEY"))
+
     gen_kwargs = {}
     if thinking_budget is not None:
-        from google.genai import types
-        gen_kwargs["config"] = types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget)
-        )
-    
+        gen_kwargs["config"] = _generate_config(thinking_budget)
+
     response = client.models.generate_content(
         model=model,
         contents=prompt,
@@ -20,6 +29,21 @@ def ask_gemini(prompt: str, model: str = "gemini-2.5-flash", thinking_budget: in
     )
     return response.text
 
+async def ask_gemini_async(prompt: str, model: str = "gemini-2.5-flash", thinking_budget: int = None) -> str:
+    """Same as ask_gemini, but awaits the SDK's async client so the event loop stays free."""
+    client = _client(os.getenv("GEMINI_API_KEY"))
+
+    gen_kwargs = {}
+    if thinking_budget is not None:
+        gen_kwargs["config"] = _generate_config(thinking_budget)
+
+    response = await client.aio.models.generate_content(
+        model=model,
+        contents=prompt,
+        **gen_kwargs
+    )
+    return response.text
+
 if __name__ == "__main__":
     prompt = "You are a senior data analyst. Summarize anomalies in the following dataset: ... (replace with actual data summary / anomalies)."
     result = ask_gemini(prompt)
@@ -1,15 +1,19 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from collections import OrderedDict
+import asyncio
+import hashlib
 import os
 import tempfile
 import json
+from string import Template
 from datetime import datetime
 from dotenv import load_dotenv
 from extract_data import load_file
 from anomaly_detector import detect_all
-from gemini_generate import ask_gemini
+from gemini_generate import ask_gemini_async
 from report_exporter import save_pdf_from_context, save_pptx_from_context
 from pre_info import summarize_df
 import pandas as pd
@@ -24,6 +28,61 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Gemini prompt templates, parsed once at import and filled per request
+ANALYZE_PROMPT = Template("""You are a Senior Business Data Analyst helping business stakeholders understand their data.
+
+Dataset Analysis:
+- File: $filename
+- Total Records: $n_rows
+- Columns: $columns
+- Anomalies Found: $total_anomalies records ($anomaly_pct% of data)
+
+Key Metrics:
+$key_metrics
+
+Your Task:
+Provide a clear, actionable business report that explains:
+
+1. **Data Overview**: What does this dataset represent and what are the key patterns?
+
+2. **Anomaly Insights**: What anomalies were detected and what might be causing them? Are they concerning or expected variations?
+
+3. **Business Impact**: How could these anomalies affect business operations, revenue, or decision-making?
+
+4. **Recommendations**: What specific actions should the business team take based on these findings?
+
+Write in clear, non-technical language that business stakeholders can understand. Be specific and actionable.""")
+
+EXECUTIVE_SUMMARY_PROMPT = Template("""You are a Senior Data Analyst writing an executive summary. Analyze:
+
+$summary
+
+Provide:
+1. Overview of data quality and patterns
+2. Analysis of anomalies and their potential causes
+3. Business recommendations
+
+Write in a professional tone. Keep it concise (3-4 paragraphs).""")
+
+REPORT_PROMPT = Template("""You are a Senior Business Data Analyst. Create an executive summary report.
+
+Dataset: $filename
+Total Records: $n_rows
+Columns: $columns
+Anomalies: $total_anomalies ($anomaly_pct%)
+
+Key Metrics:
+$key_metrics
+
+Provide a business-focused report:
+
+1. **Overview**: What does this data tell us?
+2. **Anomalies**: What unusual patterns exist? Why might they occur?
+3. **Impact**: How do these findings affect business decisions?
+4. **Actions**: What should the team do next?
+
+Write clearly for business stakeholders. Focus on insights and actions.""")
+
 class AnalysisRequest(BaseModel):
     contamination: Optional[float] = 0.01
     z_thresh: Optional[float] = 3.0
@@ -37,6 +96,123 @@ class AnalysisResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
     report_path: Optional[str] = None
 
+def _fast_describe(df, sample_rows=100_000):
+    """
+    Lightweight replacement for df.describe(include='all').to_dict().
+    Numeric columns get count/mean/std/min/max; other columns get
+    count/unique/top/freq, with the value counts taken over the first
+    `sample_rows` rows only.
+    """
+    summary = {}
+    num_df = df.select_dtypes(include=[np.number])
+    if num_df.shape[1] > 0:
+        summary.update(num_df.agg(['count', 'mean', 'std', 'min', 'max']).astype(float).to_dict())
+    
+    other_df = df.select_dtypes(exclude=[np.number]).head(sample_rows)
+    for col in other_df.columns:
+        # One hashing pass gives both the distinct count and the most frequent value
+        counts = other_df[col].value_counts()
+        top = counts.index[0] if len(counts) else None
+        summary[col] = {
+            "count": int(df[col].count()),
+            "unique": len(counts),
+            "top": top.item() if isinstance(top, np.generic) else top,
+            "freq": int(counts.iloc[0]) if len(counts) else None
+        }
+    
+    return {col: summary[col] for col in df.columns}
+
+class _LRUCache:
+    """Small least-recently-used cache for per-upload results."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+# Keyed on (extension, content hash) so re-uploading the same file, e.g. "Analyze"
+# followed by "Generate Report", skips parsing and detection entirely. Entries are
+# the per-upload summaries from _summarize_upload, never the uploaded frames
+_DETECTION_CACHE = _LRUCache(maxsize=8)
+# Keyed on (model, prompt); the prompt already encodes everything derived from the file
+_AI_CACHE = _LRUCache(maxsize=64)
+
+def _summarize_upload(df):
+    """
+    Run anomaly detection on an uploaded frame and reduce the result to what the
+    endpoints report: shape, column names, summary statistics, per-method anomaly
+    counts, and mean/std/min/max plus the anomaly-row mean of the first 8 numeric
+    columns for the AI prompts. Nothing in it grows with the number of rows.
+    """
+    anomalies_df = detect_all(df)
+    is_anomaly = anomalies_df['anomaly_any'].to_numpy()
+    
+    num_cols = df.select_dtypes(include=[np.number]).columns.tolist()[:8]
+    if num_cols:
+        # Statistics for the numeric columns in one vectorized pass
+        key_stats = df[num_cols].agg(['mean', 'std', 'min', 'max']).T
+        key_stats['anomaly_mean'] = df.loc[is_anomaly, num_cols].mean()
+    else:
+        key_stats = pd.DataFrame(columns=['mean', 'std', 'min', 'max', 'anomaly_mean'])
+    
+    return {
+        "n_rows": len(df),
+        "column_names": df.columns.tolist(),
+        "summary_statistics": _fast_describe(df),
+        "anomaly_counts": anomalies_df.sum().to_dict(),
+        "total_anomalies": int(is_anomaly.sum()),
+        "key_stats": key_stats
+    }
+
+async def _load_and_detect(tmp_path, digest):
+    """
+    Load an uploaded file, run anomaly detection on it and summarize the result.
+    Returns the _summarize_upload dict, reusing the cached one for identical uploads.
+    """
+    key = (os.path.splitext(tmp_path)[1].lower(), digest)
+    cached = _DETECTION_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    df = load_file(tmp_path)
+    # Handle SQLite case
+    if isinstance(df, dict):
+        df = list(df.values())[0] if df else pd.DataFrame()
+    if df.empty:
+        raise HTTPException(status_code=400, detail="Uploaded file contains no data")
+    
+    # CPU-bound; run off the event loop so other requests keep being served
+    upload = await asyncio.to_thread(_summarize_upload, df)
+    _DETECTION_CACHE.put(key, upload)
+    return upload
+
+async def _ask_gemini_cached(prompt, model):
+    """ask_gemini_async, memoized so an identical prompt is only sent once."""
+    key = (model, prompt)
+    cached = _AI_CACHE.get(key)
+    if cached is None:
+        cached = await ask_gemini_async(prompt, model=model)
+        _AI_CACHE.put(key, cached)
+    return cached
+
+def _pdf_response(pdf_bytes, filename):
+    """Serve a PDF built in memory as a download, without a temp file."""
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @app.get("/")
 async def root():
     return {
@@ -68,29 +244,31 @@ async def analyze_data(
 ):
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
             tmp_path = tmp_file.name
-        df = load_file(tmp_path)
-        if isinstance(df, dict):
-            df = list(df.values())[0] if df else pd.DataFrame()
-        if df.empty:
-            raise HTTPException(status_code=400, detail="Uploaded file contains no data")
-        anomalies_df = detect_all(df)
-        summary_stats = df.describe(include='all').to_dict()
-        anomaly_counts = anomalies_df.sum().to_dict()
+            # Stream in 1 MiB chunks so the whole upload is never held in memory
+            hasher = hashlib.blake2b(digest_size=16)
+            while chunk := await file.read(1 << 20):
+                tmp_file.write(chunk)
+                hasher.update(chunk)
+        upload = await _load_and_detect(tmp_path, hasher.hexdigest())
+        total_anomalies = upload["total_anomalies"]
+        n_rows = upload["n_rows"]
+        column_names = upload["column_names"]
+        anomaly_pct = float(total_anomalies / n_rows * 100)
+        summary_stats = upload["summary_statistics"]
+        anomaly_counts = upload["anomaly_counts"]
         response_data = {
             "file_info": {
                 "filename": file.filename,
-                "rows": len(df),
-                "columns": len(df.columns),
-                "column_names": df.columns.tolist()
+                "rows": n_rows,
+                "columns": len(column_names),
+                "column_names": column_names
             },
             "summary_statistics": summary_stats,
             "anomaly_detection": {
-                "total_anomalies": int(anomalies_df['anomaly_any'].sum()),
+                "total_anomalies": total_anomalies,
                 "anomaly_counts_by_method": anomaly_counts,
-                "anomaly_percentage": float(anomalies_df['anomaly_any'].sum() / len(df) * 100)
+                "anomaly_percentage": anomaly_pct
             }
         }
         # AI Analysis is REQUIRED - Generate business insights
@@ -98,53 +276,25 @@ async def analyze_data(
             if not os.getenv("GEMINI_API_KEY"):
                 response_data["ai_analysis"] = "⚠️ GEMINI_API_KEY not configured. Please add your API key to .env file to get AI-powered business insights."
             else:
-                anomaly_rows = df[anomalies_df['anomaly_any']]
-                num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-                
-                # Prepare detailed context for business analysis
-                total_anomalies = int(anomalies_df['anomaly_any'].sum())
-                anomaly_pct = float(total_anomalies / len(df) * 100)
-                
-                # Get statistics for numeric columns
+                # Statistics for the top 8 numeric columns
                 stats_summary = []
-                for col in num_cols[:8]:  # Top 8 numeric columns
-                    col_mean = df[col].mean()
-                    col_std = df[col].std()
-                    col_min = df[col].min()
-                    col_max = df[col].max()
-                    
+                for col, row in upload["key_stats"].iterrows():
                     # Check if anomalies have different patterns
                     if total_anomalies > 0:
-                        anomaly_mean = anomaly_rows[col].mean() if col in anomaly_rows.columns else col_mean
-                        stats_summary.append(f"{col}: Overall avg={col_mean:.2f}, Anomaly avg={anomaly_mean:.2f}, Range=[{col_min:.2f}-{col_max:.2f}]")
+                        stats_summary.append(f"{col}: Overall avg={row['mean']:.2f}, Anomaly avg={row['anomaly_mean']:.2f}, Range=[{row['min']:.2f}-{row['max']:.2f}]")
                     else:
-                        stats_summary.append(f"{col}: avg={col_mean:.2f}, std={col_std:.2f}, range=[{col_min:.2f}-{col_max:.2f}]")
+                        stats_summary.append(f"{col}: avg={row['mean']:.2f}, std={row['std']:.2f}, range=[{row['min']:.2f}-{row['max']:.2f}]")
                 
-                prompt = f"""You are a Senior Business Data Analyst helping business stakeholders understand their data.
-
-Dataset Analysis:
-- File: {file.filename}
-- Total Records: {len(df):,}
-- Columns: {', '.join(df.columns.tolist())}
-- Anomalies Found: {total_anomalies:,} records ({anomaly_pct:.1f}% of data)
-
-Key Metrics:
-{chr(10).join(stats_summary)}
-
-Your Task:
-Provide a clear, actionable business report that explains:
-
-1. **Data Overview**: What does this dataset represent and what are the key patterns?
-
-2. **Anomaly Insights**: What anomalies were detected and what might be causing them? Are they concerning or expected variations?
-
-3. **Business Impact**: How could these anomalies affect business operations, revenue, or decision-making?
-
-4. **Recommendations**: What specific actions should the business team take based on these findings?
-
-Write in clear, non-technical language that business stakeholders can understand. Be specific and actionable."""
+                prompt = ANALYZE_PROMPT.substitute(
+                    filename=file.filename,
+                    n_rows=f"{n_rows:,}",
+                    columns=', '.join(column_names),
+                    total_anomalies=f"{total_anomalies:,}",
+                    anomaly_pct=f"{anomaly_pct:.1f}",
+                    key_metrics=chr(10).join(stats_summary)
+                )
                 
-                ai_response = ask_gemini(prompt, model=ai_model)
+                ai_response = await _ask_gemini_cached(prompt, model=ai_model)
                 response_data["ai_analysis"] = ai_response
         except Exception as e:
             response_data["ai_analysis"] = f"⚠️ AI analysis error: {str(e)}. Please check your GEMINI_API_KEY configuration."
@@ -168,46 +318,36 @@ async def upload_analyze_and_report(
 ):
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
             tmp_path = tmp_file.name
-        df = load_file(tmp_path)
-        if isinstance(df, dict):
-            df = list(df.values())[0] if df else pd.DataFrame()
-        if df.empty:
-            raise HTTPException(status_code=400, detail="Uploaded file contains no data")
-        anomalies_df = detect_all(df)
+            # Stream in 1 MiB chunks so the whole upload is never held in memory
+            hasher = hashlib.blake2b(digest_size=16)
+            while chunk := await file.read(1 << 20):
+                tmp_file.write(chunk)
+                hasher.update(chunk)
+        upload = await _load_and_detect(tmp_path, hasher.hexdigest())
+        total_anomalies = upload["total_anomalies"]
+        n_rows = upload["n_rows"]
+        column_names = upload["column_names"]
+        anomaly_pct = float(total_anomalies / n_rows * 100)
         # AI Analysis - REQUIRED for business insights
         ai_analysis = ""
         if not os.getenv("GEMINI_API_KEY"):
             ai_analysis = "⚠️ GEMINI_API_KEY not configured. Add your API key to .env for AI-powered insights."
         else:
             try:
-                anomaly_rows = df[anomalies_df['anomaly_any']]
-                num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-                
                 # Create concise summary
                 summary_lines = []
-                summary_lines.append(f"Dataset: {len(df)} rows, {len(df.columns)} columns")
-                summary_lines.append(f"Columns: {', '.join(df.columns.tolist()[:10])}")
-                summary_lines.append(f"Anomalies detected: {int(anomalies_df['anomaly_any'].sum())} ({float(anomalies_df['anomaly_any'].sum() / len(df) * 100):.1f}%)")
+                summary_lines.append(f"Dataset: {n_rows} rows, {len(column_names)} columns")
+                summary_lines.append(f"Columns: {', '.join(column_names[:10])}")
+                summary_lines.append(f"Anomalies detected: {total_anomalies} ({anomaly_pct:.1f}%)")
                 
-                # Add key statistics  
-                for col in num_cols[:5]:  # Only first 5 numeric columns
-                    summary_lines.append(f"{col}: mean={df[col].mean():.2f}, std={df[col].std():.2f}")
+                # Add key statistics for only the first 5 numeric columns
+                for col, row in upload["key_stats"].head(5).iterrows():
+                    summary_lines.append(f"{col}: mean={row['mean']:.2f}, std={row['std']:.2f}")
                 
-                prompt = f"""You are a Senior Data Analyst writing an executive summary. Analyze:
-
-{chr(10).join(summary_lines)}
-
-Provide:
-1. Overview of data quality and patterns
-2. Analysis of anomalies and their potential causes
-3. Business recommendations
-
-Write in a professional tone. Keep it concise (3-4 paragraphs)."""
+                prompt = EXECUTIVE_SUMMARY_PROMPT.substitute(summary=chr(10).join(summary_lines))
                 
-                ai_analysis = ask_gemini(prompt, model=ai_model)
+                ai_analysis = await _ask_gemini_cached(prompt, model=ai_model)
             except Exception as e:
                 ai_analysis = f"AI analysis unavailable: {str(e)}"
         report_context = {
@@ -215,26 +355,20 @@ Write in a professional tone. Keep it concise (3-4 paragraphs)."""
             "generated_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "file_info": {
                 "filename": file.filename,
-                "rows": len(df),
-                "columns": len(df.columns),
-                "column_names": df.columns.tolist()
+                "rows": n_rows,
+                "columns": len(column_names),
+                "column_names": column_names
             },
             "anomalies_summary": {
-                "total": int(anomalies_df['anomaly_any'].sum()),
-                "percentage": f"{anomalies_df['anomaly_any'].sum() / len(df) * 100:.2f}%"
+                "total": total_anomalies,
+                "percentage": f"{anomaly_pct:.2f}%"
             },
             "ai_analysis": ai_analysis
         }
         if generate_pdf:
-            output_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            output_pdf.close()
-            save_pdf_from_context(report_context, output_pdf.name)
+            pdf_bytes = save_pdf_from_context(report_context)
             os.unlink(tmp_path)
-            return FileResponse(
-                output_pdf.name,
-                media_type="application/pdf",
-                filename=f"trendspotter_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            )
+            return _pdf_response(pdf_bytes, f"trendspotter_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
         else:
             os.unlink(tmp_path)
             return JSONResponse(content={
@@ -262,22 +396,19 @@ async def generate_report(
     try:
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
             tmp_path = tmp_file.name
+            # Stream in 1 MiB chunks so the whole upload is never held in memory
+            hasher = hashlib.blake2b(digest_size=16)
+            while chunk := await file.read(1 << 20):
+                tmp_file.write(chunk)
+                hasher.update(chunk)
         
-        # Load the data
-        df = load_file(tmp_path)
-        
-        # Handle SQLite case
-        if isinstance(df, dict):
-            df = list(df.values())[0] if df else pd.DataFrame()
-        
-        if df.empty:
-            raise HTTPException(status_code=400, detail="Uploaded file contains no data")
-        
-        # Detect anomalies
-        anomalies_df = detect_all(df)
+        # Load the data and detect anomalies (memoized on the upload's content hash)
+        upload = await _load_and_detect(tmp_path, hasher.hexdigest())
+        total_anomalies = upload["total_anomalies"]
+        n_rows = upload["n_rows"]
+        column_names = upload["column_names"]
+        anomaly_pct = float(total_anomalies / n_rows * 100)
         
         # AI Analysis - REQUIRED for business insights
         ai_analysis = ""
@@ -285,44 +416,24 @@ async def generate_report(
             ai_analysis = "⚠️ GEMINI_API_KEY not configured. Add your API key to .env to enable AI-powered business insights."
         else:
             try:
-                num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-                anomaly_rows = df[anomalies_df['anomaly_any']]
-                
-                total_anomalies = int(anomalies_df['anomaly_any'].sum())
-                anomaly_pct = float(total_anomalies / len(df) * 100)
-                
                 # Build detailed statistics
                 stats_summary = []
-                for col in num_cols[:8]:
-                    col_mean = df[col].mean()
-                    col_std = df[col].std()
-                    
-                    if total_anomalies > 0 and col in anomaly_rows.columns:
-                        anomaly_mean = anomaly_rows[col].mean()
-                        stats_summary.append(f"{col}: Normal={col_mean:.2f}, Anomaly={anomaly_mean:.2f}")
+                for col, row in upload["key_stats"].iterrows():
+                    if total_anomalies > 0:
+                        stats_summary.append(f"{col}: Normal={row['mean']:.2f}, Anomaly={row['anomaly_mean']:.2f}")
                     else:
-                        stats_summary.append(f"{col}: mean={col_mean:.2f}, std={col_std:.2f}")
+                        stats_summary.append(f"{col}: mean={row['mean']:.2f}, std={row['std']:.2f}")
                 
-                prompt = f"""You are a Senior Business Data Analyst. Create an executive summary report.
-
-Dataset: {file.filename}
-Total Records: {len(df):,}
-Columns: {', '.join(df.columns.tolist())}
-Anomalies: {total_anomalies:,} ({anomaly_pct:.1f}%)
-
-Key Metrics:
-{chr(10).join(stats_summary)}
-
-Provide a business-focused report:
-
-1. **Overview**: What does this data tell us?
-2. **Anomalies**: What unusual patterns exist? Why might they occur?
-3. **Impact**: How do these findings affect business decisions?
-4. **Actions**: What should the team do next?
-
-Write clearly for business stakeholders. Focus on insights and actions."""
+                prompt = REPORT_PROMPT.substitute(
+                    filename=file.filename,
+                    n_rows=f"{n_rows:,}",
+                    columns=', '.join(column_names),
+                    total_anomalies=f"{total_anomalies:,}",
+                    anomaly_pct=f"{anomaly_pct:.1f}",
+                    key_metrics=chr(10).join(stats_summary)
+                )
                 
-                ai_analysis = ask_gemini(prompt, model="gemini-2.5-flash")
+                ai_analysis = await _ask_gemini_cached(prompt, model="gemini-2.5-flash")
             except Exception as e:
                 ai_analysis = f"⚠️ AI error: {str(e)}"
         
@@ -332,31 +443,25 @@ Write clearly for business stakeholders. Focus on insights and actions."""
             "generated_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "file_info": {
                 "filename": file.filename,
-                "rows": len(df),
-                "columns": len(df.columns),
-                "column_names": df.columns.tolist()
+                "rows": n_rows,
+                "columns": len(column_names),
+                "column_names": column_names
             },
             "anomalies_summary": {
-                "total": int(anomalies_df['anomaly_any'].sum()),
-                "percentage": f"{anomalies_df['anomaly_any'].sum() / len(df) * 100:.2f}%"
+                "total": total_anomalies,
+                "percentage": f"{anomaly_pct:.2f}%"
             },
             "ai_analysis": ai_analysis
         }
         
-        # Generate PDF
-        output_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        output_pdf.close()
-        save_pdf_from_context(report_context, output_pdf.name)
+        # Generate PDF in memory
+        pdf_bytes = save_pdf_from_context(report_context)
         
         # Cleanup
         os.unlink(tmp_path)
         
         # Return PDF
-        return FileResponse(
-            output_pdf.name,
-            media_type="application/pdf",
-            filename=f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        )
+        return _pdf_response(pdf_bytes, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
     
     except Exception as e:
         if 'tmp_path' in locals() and os.path.exists(tmp_path):
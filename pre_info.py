@@ -8,19 +8,23 @@ def summarize_df(df, output_prefix=None):
     print(df.dtypes)       
     print()
 
+    # describe(include='all') already holds the numeric stats; slice them out instead of a second pass
+    full_summary = df.describe(include='all')
+    num_cols = df.select_dtypes(include='number').columns
+    num_rows = ~full_summary.index.isin(['unique', 'top', 'freq'])
+    num_summary = full_summary.loc[num_rows, num_cols].astype(float)
+
     print("=== Numeric summary (describe) ===")
-    num_summary = df.describe()
     print(num_summary)
     print()
 
     print("=== Full summary (all columns) ===")
-    full_summary = df.describe(include='all')
     print(full_summary)
     print()
 
     print("=== Missing values per column ===")
     missing = df.isna().sum().rename("na_count")
-    missing_pct = (df.isna().mean() * 100).rename("na_pct")
+    missing_pct = (missing / len(df) * 100).rename("na_pct")
     missing_summary = pd.concat([missing, missing_pct], axis=1)
     print(missing_summary)
     print()
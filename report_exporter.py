@@ -1,302 +1,589 @@
-from jinja2 import Environment, FileSystemLoader
-import pandas as pd
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import os
 import re
-import markdown
-from bs4 import BeautifulSoup
+from markdown_it import MarkdownIt
+from markdown_it.tree import SyntaxTreeNode
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import simpleSplit
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, ListStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, ListFlowable, ListItem
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, ListFlowable, ListItem
 from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
 from io import BytesIO
+from datetime import datetime
+from types import SimpleNamespace
+from collections import namedtuple
+from xml.sax.saxutils import escape
+from html import unescape
 
-def convert_markdown_to_reportlab(md_text: str, styles):
+def _write_pdf(buf: BytesIO, output_path) -> bytes:
     """
-    Convert markdown text to ReportLab flowables using markdown library.
+    Write a PDF built in memory to disk in one go (if a path is given) and return its bytes.
+    """
+    data = buf.getvalue()
+    if output_path is not None:
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        print(f"Saved PDF report to {output_path}")
+    return data
+
+def _new_doc(buf, first_page=None, reserved: float = 0, **kwargs) -> BaseDocTemplate:
+    """
+    Letter-size document with one full-page frame per page. If first_page is
+    given it is called to draw on page one, whose frame starts `reserved` points
+    lower. Page templates hold per-build frame state, so each document gets its own.
+    """
+    doc = BaseDocTemplate(buf, pagesize=letter, **kwargs)
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='body')
+    main = PageTemplate(id='main', frames=[frame], pagesize=letter)
+    if first_page is None:
+        doc.addPageTemplates([main])
+        return doc
+    first_frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height - reserved, id='first')
+    first = PageTemplate(id='first', frames=[first_frame], onPage=first_page,
+                         pagesize=letter, autoNextPageTemplate='main')
+    doc.addPageTemplates([first, main])
+    return doc
+
+# Header colours of the file-info and anomaly-summary tables
+_HEADER_BLUE = colors.HexColor('#3498DB')
+_HEADER_RED = colors.HexColor('#E74C3C')
+
+_MARKDOWN_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+# Markdown lists: marker 20pt in from the margin, item text 14pt after it
+_BULLET_LIST_STYLE = ListStyle(
+    'MarkdownBullets',
+    bulletType='bullet',
+    leftIndent=34,
+    bulletDedent=14,
+    bulletFontSize=11,
+    spaceAfter=6
+)
+
+_NUMBERED_LIST_STYLE = ListStyle(
+    'MarkdownNumbers',
+    parent=_BULLET_LIST_STYLE,
+    bulletType='1',
+    bulletFormat='%s.'
+)
+
+# Two-column layout and header rows of the file-info and anomaly-summary tables
+_SUMMARY_COLWIDTHS = (2*inch, 4*inch)
+_FILE_HEADER = ('Property', 'Value')
+_ANOMALY_HEADER = ('Metric', 'Value')
+
+# Same look as _MARKDOWN_TABLE_STYLE, with row rules instead of a full grid
+_LARGE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+# Markdown tables longer than this are split into chunks of this many rows
+_TABLE_CHUNK_ROWS = 50
+
+# Usable width of a letter page inside the default 1 inch margins
+_BODY_WIDTH = letter[0] - 2*inch
+
+# Frames pad their content on every side, so flowables get a little less
+_FRAME_PADDING = 6
+_INNER_WIDTH = _BODY_WIDTH - 2*_FRAME_PADDING
+
+@lru_cache(maxsize=1)
+def _styles() -> SimpleNamespace:
+    """
+    Every ParagraphStyle the PDF uses, built once per process from ReportLab's
+    sample stylesheet. Nothing mutates them after construction.
+    """
+    ss = getSampleStyleSheet()
+    return SimpleNamespace(
+        heading=ParagraphStyle(
+            'CustomHeading',
+            parent=ss['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#34495E'),
+            spaceAfter=12,
+            spaceBefore=12
+        ),
+        h1=ParagraphStyle(
+            'CustomH1',
+            parent=ss['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#2C3E50'),
+            spaceAfter=12,
+            spaceBefore=16,
+            fontName='Helvetica-Bold'
+        ),
+        h2=ParagraphStyle(
+            'CustomH2',
+            parent=ss['Heading2'],
+            fontSize=15,
+            textColor=colors.HexColor('#34495E'),
+            spaceAfter=10,
+            spaceBefore=14,
+            fontName='Helvetica-Bold'
+        ),
+        h3=ParagraphStyle(
+            'CustomH3',
+            parent=ss['Heading3'],
+            fontSize=13,
+            textColor=colors.HexColor('#34495E'),
+            spaceAfter=8,
+            spaceBefore=12,
+            fontName='Helvetica-Bold'
+        ),
+        body=ParagraphStyle(
+            'BodyText',
+            parent=ss['Normal'],
+            fontSize=11,
+            leading=16,
+            alignment=TA_JUSTIFY,
+            spaceAfter=10
+        ),
+        list=ParagraphStyle(
+            'ListItem',
+            parent=ss['Normal'],
+            fontSize=11,
+            leading=16,
+            spaceAfter=6
+        ),
+        quote=ParagraphStyle(
+            'Quote',
+            parent=ss['Normal'],
+            fontSize=11,
+            leftIndent=30,
+            rightIndent=30,
+            textColor=colors.HexColor('#7F8C8D'),
+            spaceAfter=10
+        )
+    )
+
+# Any HTML tag, comment or doctype
+_ANY_TAG_RE = re.compile(r'<[^>]*>')
+
+# Per-tag handlers: each takes (element, styles) and returns a list of flowables
+def _heading(element, styles):
+    return [Paragraph(_inline(element), getattr(styles, element.tag))]
+
+def _paragraph(element, styles):
+    text = _inline(element)
+    return [Paragraph(text, styles.body)] if text.strip() else []
+
+def _list(element, styles):
+    items = []
+    for li in element.children:
+        # Nested lists are laid out inside their parent item
+        nested = [child for child in li.children if child.tag in ('ul', 'ol')]
+        flowables = [Paragraph(_inline(li, skip=nested), styles.list)]
+        for sublist in nested:
+            flowables.extend(_list(sublist, styles))
+        items.append(ListItem(flowables))
+    if element.tag == 'ol':
+        start = int(element.attrs.get('start', 1))
+        return [ListFlowable(items, start=start, style=_NUMBERED_LIST_STYLE)]
+    return [ListFlowable(items, style=_BULLET_LIST_STYLE)]
+
+def _table(element, styles):
+    table_data = []
+    for section in element.children:
+        for row in section.children:
+            row_data = [_inline(cell) for cell in row.children]
+            if row_data:
+                table_data.append(row_data)
+    
+    if not table_data:
+        return []
+    if len(table_data) <= _TABLE_CHUNK_ROWS:
+        t = Table(table_data)
+        t.setStyle(_MARKDOWN_TABLE_STYLE)
+        return [t, Spacer(1, 0.15*inch)]
+    
+    # Large tables: fixed column widths skip ReportLab's width resolution, and
+    # fixed-size chunks (each repeating the header) keep page splitting linear
+    header, rows = table_data[0], table_data[1:]
+    ncols = max(len(row) for row in table_data)
+    widths = [_INNER_WIDTH / ncols] * ncols
+    flowables = []
+    for start in range(0, len(rows), _TABLE_CHUNK_ROWS):
+        t = Table([header] + rows[start:start + _TABLE_CHUNK_ROWS], colWidths=widths, repeatRows=1)
+        t.setStyle(_LARGE_TABLE_STYLE)
+        flowables.append(t)
+    flowables.append(Spacer(1, 0.15*inch))
+    return flowables
+
+def _code_block(element, styles):
+    opening, closing = _INLINE_MARKUP['code']
+    code = escape(element.content.rstrip('\n')).replace('\n', '<br/>')
+    return [Paragraph(opening + code + closing, styles.body)] if code.strip() else []
+
+def _html_text(html: str) -> str:
+    """Text of an HTML fragment as ReportLab-safe markup: tags dropped, entities decoded, whitespace collapsed."""
+    return escape(unescape(' '.join(_ANY_TAG_RE.sub(' ', html).split())))
+
+def _html_block(element, styles):
+    # Raw HTML from the model: keep just its text
+    text = _html_text(element.content)
+    return [Paragraph(text, styles.body)] if text else []
+
+def _blockquote(element, styles):
+    return [Paragraph(_inline(element), styles.quote)]
+
+_HANDLERS = {
+    'h1': _heading,
+    'h2': _heading,
+    'h3': _heading,
+    'p': _paragraph,
+    'ul': _list,
+    'ol': _list,
+    'table': _table,
+    'blockquote': _blockquote,
+    'code': _code_block,
+    'html_block': _html_block,
+}
+
+# CommonMark plus tables. Single newlines are soft wraps that Paragraph reflows;
+# only explicit hard breaks (trailing double space or backslash) break a line.
+# Built once: parse() keeps all per-document state in a fresh StateCore, so the
+# one instance is safe to share across threads without a lock or a pool.
+_MD = MarkdownIt('commonmark').enable('table')
+
+@lru_cache(maxsize=8)
+def _markdown_tree(md_text: str) -> SyntaxTreeNode:
+    """
+    Parsed AI analysis, shared by the PDF and PPTX writers so it is parsed once.
+    """
+    return SyntaxTreeNode(_MD.parse(md_text))
+
+def convert_markdown_to_reportlab(md_text: str, styles=None):
+    """
+    Convert markdown text to ReportLab flowables by walking markdown-it's syntax tree.
     Handles headings, bold, italic, lists, tables, and paragraphs.
+    The module's own cached styles are used; `styles` is kept for compatibility.
     """
-    # Convert markdown to HTML
-    html = markdown.markdown(md_text, extensions=['tables', 'nl2br'])
-    
-    # Parse HTML with BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
+    if not md_text or not md_text.strip():
+        return []
     
+    S = _styles()
     elements = []
-    
-    # Define custom styles
-    h1_style = ParagraphStyle(
-        'CustomH1',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=12,
-        spaceBefore=16,
-        fontName='Helvetica-Bold'
-    )
-    
-    h2_style = ParagraphStyle(
-        'CustomH2',
-        parent=styles['Heading2'],
-        fontSize=15,
-        textColor=colors.HexColor('#34495E'),
-        spaceAfter=10,
-        spaceBefore=14,
-        fontName='Helvetica-Bold'
-    )
-    
-    h3_style = ParagraphStyle(
-        'CustomH3',
-        parent=styles['Heading3'],
-        fontSize=13,
-        textColor=colors.HexColor('#34495E'),
-        spaceAfter=8,
-        spaceBefore=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=16,
-        alignment=TA_JUSTIFY,
-        spaceAfter=10
-    )
-    
-    list_style = ParagraphStyle(
-        'ListItem',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=16,
-        leftIndent=20,
-        bulletIndent=10,
-        spaceAfter=6
-    )
-    
-    # Process each HTML element
-    for element in soup.find_all(recursive=False):
-        if element.name == 'h1':
-            elements.append(Paragraph(clean_html_tags(str(element)), h1_style))
-        elif element.name == 'h2':
-            elements.append(Paragraph(clean_html_tags(str(element)), h2_style))
-        elif element.name == 'h3':
-            elements.append(Paragraph(clean_html_tags(str(element)), h3_style))
-        elif element.name == 'p':
-            text = clean_html_tags(str(element))
-            if text.strip():
-                elements.append(Paragraph(text, body_style))
-        elif element.name in ['ul', 'ol']:
-            # Handle lists
-            for li in element.find_all('li', recursive=False):
-                text = clean_html_tags(str(li))
-                elements.append(Paragraph(f"• {text}", list_style))
-        elif element.name == 'table':
-            # Handle tables
-            table_data = []
-            for row in element.find_all('tr'):
-                row_data = []
-                for cell in row.find_all(['th', 'td']):
-                    row_data.append(clean_html_tags(str(cell)))
-                if row_data:
-                    table_data.append(row_data)
-            
-            if table_data:
-                t = Table(table_data)
-                t.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ]))
-                elements.append(t)
-                elements.append(Spacer(1, 0.15*inch))
-        elif element.name == 'blockquote':
-            quote_style = ParagraphStyle(
-                'Quote',
-                parent=styles['Normal'],
-                fontSize=11,
-                leftIndent=30,
-                rightIndent=30,
-                textColor=colors.HexColor('#7F8C8D'),
-                spaceAfter=10
-            )
-            text = clean_html_tags(str(element))
-            elements.append(Paragraph(text, quote_style))
+    for element in _markdown_tree(md_text).children:
+        # html_block nodes have no tag, so fall back to the node type
+        handler = _HANDLERS.get(element.tag or element.type)
+        if handler:
+            elements.extend(handler(element, S))
     
     return elements
 
-def clean_html_tags(html_text: str) -> str:
+# Tag name -> (opening, closing) ReportLab inline markup
+_INLINE_MARKUP = {
+    'strong': ('<b>', '</b>'),
+    'b': ('<b>', '</b>'),
+    'em': ('<i>', '</i>'),
+    'i': ('<i>', '</i>'),
+    'u': ('<u>', '</u>'),
+    'code': ('<font name="Courier" size="10">', '</font>'),
+}
+
+# A single raw HTML tag; group 1 is '/' for closing tags, group 2 the tag name
+_HTML_TAG_RE = re.compile(r'<(/?)([A-Za-z][A-Za-z0-9]*)\b[^>]*>')
+
+def _html_inline(raw: str, parts: list, opened: list):
     """
-    Convert HTML tags to ReportLab XML tags.
+    Map a raw inline HTML tag from the model onto ReportLab markup; drop anything else.
+    `opened` holds the markup of the tags still open at this level, innermost
+    last: a closing tag without an open match is dropped, and one that matches
+    closes everything opened after it first.
     """
-    # Remove the outer tag
-    html_text = re.sub(r'^<[^>]+>', '', html_text)
-    html_text = re.sub(r'</[^>]+>$', '', html_text)
-    
-    # Convert <strong> and <b> to <b>
-    html_text = re.sub(r'<strong>', '<b>', html_text)
-    html_text = re.sub(r'</strong>', '</b>', html_text)
-    
-    # Convert <em> and <i> to <i>
-    html_text = re.sub(r'<em>', '<i>', html_text)
-    html_text = re.sub(r'</em>', '</i>', html_text)
-    
-    # Convert <code> to monospace
-    html_text = re.sub(r'<code>', '<font name="Courier" size="10">', html_text)
-    html_text = re.sub(r'</code>', '</font>', html_text)
-    
-    # Remove other HTML tags
-    html_text = re.sub(r'<br\s*/?>', '<br/>', html_text)
-    
-    # Remove any remaining unsupported tags
-    html_text = re.sub(r'<(?!/?[biu]|/?font|br/?)([^>]+)>', '', html_text)
-    
-    return html_text.strip()
+    match = _HTML_TAG_RE.fullmatch(raw)
+    if match is None:
+        return
+    name = match.group(2).lower()
+    if name == 'br':
+        parts.append('<br/>')
+        return
+    markup = _INLINE_MARKUP.get(name)
+    if markup is None:
+        return
+    if not match.group(1):
+        opened.append(markup)
+        parts.append(markup[0])
+    elif markup in opened:
+        while True:
+            top = opened.pop()
+            parts.append(top[1])
+            if top == markup:
+                break
+
+def _inline_parts(node, parts: list, skip=()):
+    # Raw tags the model leaves open are closed before the enclosing element
+    # closes, so the markup always nests the way ReportLab's parser requires
+    opened = []
+    for child in node.children:
+        if child in skip:
+            continue
+        kind = child.type
+        if kind == 'text':
+            parts.append(escape(child.content))
+        elif kind == 'code_inline':
+            opening, closing = _INLINE_MARKUP['code']
+            parts.append(opening + escape(child.content) + closing)
+        elif kind == 'softbreak':
+            parts.append('\n')
+        elif kind == 'hardbreak':
+            parts.append('<br/>\n')
+        elif kind == 'html_inline':
+            _html_inline(child.content, parts, opened)
+        elif kind == 'image':
+            continue
+        else:
+            # Block children (paragraphs in list items and quotes) are separated
+            # by whitespace; unsupported inline tags keep only their content
+            if child.block and parts:
+                parts.append('\n')
+            markup = _INLINE_MARKUP.get(child.tag)
+            if markup:
+                parts.append(markup[0])
+            _inline_parts(child, parts)
+            if markup:
+                parts.append(markup[1])
+    for markup in reversed(opened):
+        parts.append(markup[1])
+
+def _inline(node, skip=()) -> str:
+    """
+    Render a node's contents as ReportLab inline markup.
+    """
+    parts = []
+    _inline_parts(node, parts, skip)
+    return ''.join(parts).strip()
+
+# One slide bullet: plain text plus its indent level
+_Block = namedtuple('_Block', ['text', 'level'])
+
+def _plain_parts(node, parts: list, skip=()):
+    for child in node.children:
+        if child in skip:
+            continue
+        kind = child.type
+        if kind in ('text', 'code_inline'):
+            parts.append(child.content)
+        elif kind in ('softbreak', 'hardbreak'):
+            parts.append(' ')
+        elif kind not in ('html_inline', 'image'):
+            if child.block and parts:
+                parts.append(' ')
+            _plain_parts(child, parts)
+
+def _plain(node, skip=()) -> str:
+    parts = []
+    _plain_parts(node, parts, skip)
+    return ''.join(parts).strip()
 
-def parse_markdown_to_paragraphs(text: str, styles):
+def _collect_blocks(nodes, level: int, blocks: list):
+    for node in nodes:
+        tag = node.tag
+        if tag in ('ul', 'ol'):
+            for li in node.children:
+                nested = [child for child in li.children if child.tag in ('ul', 'ol')]
+                blocks.append(_Block(_plain(li, skip=nested), level + 1))
+                _collect_blocks(nested, level + 1, blocks)
+        elif tag == 'table':
+            for section in node.children:
+                for row in section.children:
+                    blocks.append(_Block(' | '.join(_plain(cell) for cell in row.children), level + 1))
+        elif tag == 'code':
+            blocks.append(_Block(node.content.strip(), level))
+        else:
+            blocks.append(_Block(_plain(node), level))
+
+def _parse_markdown_blocks(md_text: str) -> list:
+    """
+    Flatten markdown into slide bullets: headings, paragraphs and quotes at
+    level 0, list items and table rows one level deeper. Empty blocks are dropped.
+    """
+    blocks = []
+    _collect_blocks(_markdown_tree(md_text).children, 0, blocks)
+    return [block for block in blocks if block.text]
+
+@lru_cache(maxsize=8)
+def _get_env(template_dir: str) -> Environment:
     """
-    DEPRECATED: Use convert_markdown_to_reportlab instead.
-    Kept for backward compatibility.
+    One Jinja Environment per template directory. The Environment memoizes
+    compiled templates, and the bytecode cache keeps them across restarts.
     """
-    return convert_markdown_to_reportlab(text, styles)
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        bytecode_cache=FileSystemBytecodeCache(),
+        auto_reload=False
+    )
 
 def render_html_report(context: dict, template_dir: str, template_file: str) -> str:
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template(template_file)
+    template = _get_env(template_dir).get_template(template_file)
     html = template.render(**context)
     return html
 
-def save_pdf_from_html(html_str: str, output_path: str):
+def save_pdf_from_html(html_str: str, output_path: str = None) -> bytes:
     """
-    This function is kept for compatibility but now uses context-based PDF generation.
+    This function is kept for compatibility and renders only the page's text.
     For better results, use save_pdf_from_context() directly.
     """
-    # Simple fallback - just save as text
-    from reportlab.platypus import SimpleDocTemplate, Paragraph
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    doc = SimpleDocTemplate(output_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Strip HTML tags for simple rendering
-    import re
-    text = re.sub('<[^<]+?>', '', html_str)
-    story.append(Paragraph(text[:1000], styles['Normal']))  # Limit to first 1000 chars
-    
-    doc.build(story)
-    print(f"Saved PDF report to {output_path}")
+    # Tags are stripped up front: indented HTML would otherwise parse as markdown code blocks
+    buf = BytesIO()
+    _new_doc(buf).build([Paragraph(_html_text(html_str), _styles().body)])
+    return _write_pdf(buf, output_path)
+
+# Page one opens with a fixed preamble: title, generation time and the two
+# summary tables. It is drawn straight onto the canvas with the geometry the
+# equivalent flowables had, so only the AI analysis goes through the frame.
+
+def _summary_tables(context: dict) -> list:
+    """(heading, header colour, rows) for each summary table the context has."""
+    tables = []
+    if 'file_info' in context:
+        file_info = context['file_info']
+        tables.append(("File Information", _HEADER_BLUE, [
+            _FILE_HEADER,
+            ('Filename', str(file_info.get('filename', 'N/A'))),
+            ('Total Rows', str(file_info.get('rows', 0))),
+            ('Total Columns', str(file_info.get('columns', 0))),
+        ]))
+    if 'anomalies_summary' in context:
+        summary = context['anomalies_summary']
+        tables.append(("Anomaly Detection Summary", _HEADER_RED, [
+            _ANOMALY_HEADER,
+            ('Total Anomalies', str(summary.get('total', 0))),
+            ('Percentage', str(summary.get('percentage', '0%'))),
+        ]))
+    return tables
+
+def _draw_summary_table(canvas, x: float, top: float, rows: list, header_color):
+    label_width, value_width = _SUMMARY_COLWIDTHS
+    # Header row is 27pt (12pt text, 12pt bottom padding), body rows 18pt
+    edges = [top, top - 27]
+    for _ in rows[1:]:
+        edges.append(edges[-1] - 18)
+    
+    canvas.setFillColor(header_color)
+    canvas.rect(x, edges[1], label_width + value_width, 27, stroke=0, fill=1)
+    canvas.setFillColor(colors.beige)
+    canvas.rect(x, edges[-1], label_width + value_width, edges[1] - edges[-1], stroke=0, fill=1)
+    
+    canvas.setFillColor(colors.whitesmoke)
+    canvas.setFont('Helvetica-Bold', 12)
+    canvas.drawString(x + 6, edges[1] + 12, rows[0][0])
+    canvas.drawString(x + label_width + 6, edges[1] + 12, rows[0][1])
+    canvas.setFillColor(colors.black)
+    canvas.setFont('Helvetica', 10)
+    for (label, value), bottom in zip(rows[1:], edges[2:]):
+        canvas.drawString(x + 6, bottom + 5, label)
+        canvas.drawString(x + label_width + 6, bottom + 5, value)
+    
+    canvas.setStrokeColor(colors.black)
+    canvas.setLineWidth(1)
+    canvas.grid([x, x + label_width, x + label_width + value_width], edges)
+
+def _layout_preamble(context: dict, canvas=None, x: float = 0, top: float = 0) -> float:
+    """
+    Lay out the preamble from (x, top) downwards, drawing it when a canvas is
+    given. Returns its height, including the gap before the first body heading.
+    """
+    y = top
+    center = x + _INNER_WIDTH / 2
+    
+    # Title: 24pt on 22pt leading, wrapped to the frame width, 30pt after
+    title = context.get('title', 'TrendSpotter Report')
+    if canvas is not None:
+        canvas.setFillColor(colors.HexColor('#2C3E50'))
+        canvas.setFont('Helvetica-Bold', 24)
+    for line in simpleSplit(title, 'Helvetica-Bold', 24, _INNER_WIDTH):
+        y -= 22
+        if canvas is not None:
+            canvas.drawCentredString(center, y - 2, line)
+    y -= 30
+    
+    y -= 12
+    if canvas is not None:
+        canvas.setFillColor(colors.black)
+        canvas.setFont('Helvetica', 10)
+        canvas.drawString(x, y + 2, f"Generated: {context.get('generated_on', 'N/A')}")
+    y -= 0.3*inch
+    
+    table_x = x + (_INNER_WIDTH - sum(_SUMMARY_COLWIDTHS)) / 2
+    for heading, header_color, rows in _summary_tables(context):
+        # Section heading: 16pt on 18pt leading, 12pt before and after
+        y -= 12 + 18
+        if canvas is not None:
+            canvas.setFillColor(colors.HexColor('#34495E'))
+            canvas.setFont('Helvetica-Bold', 16)
+            canvas.drawString(x, y + 2, heading)
+        y -= 12
+        if canvas is not None:
+            _draw_summary_table(canvas, table_x, y, rows, header_color)
+        y -= 27 + 18 * (len(rows) - 1)
+        y -= 0.2*inch
+    
+    # A frame drops the space before its first flowable, so reserve the
+    # body heading's 12pt here instead
+    y -= 12
+    return top - y
 
-def save_pdf_from_context(context: dict, output_path: str):
+def save_pdf_from_context(context: dict, output_path: str = None) -> bytes:
     """
     Generate a professional PDF report from context using ReportLab.
     This is the recommended method for PDF generation.
+    Returns the PDF bytes; they are also written to output_path when one is given.
     """
-    doc = SimpleDocTemplate(output_path, pagesize=letter,
-                           topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
+    def first_page(canvas, doc):
+        canvas.saveState()
+        _layout_preamble(context, canvas, doc.leftMargin + _FRAME_PADDING,
+                         doc.bottomMargin + doc.height - _FRAME_PADDING)
+        canvas.restoreState()
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#34495E'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
+    buf = BytesIO()
+    doc = _new_doc(buf, first_page=first_page, reserved=_layout_preamble(context),
+                   topMargin=0.5*inch, bottomMargin=0.5*inch)
     
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=16,
-        alignment=TA_JUSTIFY,
-        spaceAfter=8
-    )
+    S = _styles()
     
-    # Build story
+    # Title, generation time and summary tables are drawn by first_page
     story = []
     
-    # Title
-    story.append(Paragraph(context.get('title', 'TrendSpotter Report'), title_style))
-    story.append(Paragraph(f"Generated: {context.get('generated_on', 'N/A')}", styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # File Info
-    if 'file_info' in context:
-        story.append(Paragraph("File Information", heading_style))
-        file_data = [
-            ['Property', 'Value'],
-            ['Filename', context['file_info'].get('filename', 'N/A')],
-            ['Total Rows', str(context['file_info'].get('rows', 0))],
-            ['Total Columns', str(context['file_info'].get('columns', 0))]
-        ]
-        t = Table(file_data, colWidths=[2*inch, 4*inch])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 0.2*inch))
-    
-    # Anomaly Summary
-    if 'anomalies_summary' in context:
-        story.append(Paragraph("Anomaly Detection Summary", heading_style))
-        anomaly_data = [
-            ['Metric', 'Value'],
-            ['Total Anomalies', str(context['anomalies_summary'].get('total', 0))],
-            ['Percentage', context['anomalies_summary'].get('percentage', '0%')]
-        ]
-        t = Table(anomaly_data, colWidths=[2*inch, 4*inch])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E74C3C')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 0.2*inch))
-    
     # AI Analysis
-    if 'ai_analysis' in context and context['ai_analysis']:
-        story.append(Paragraph("AI-Generated Business Analysis", heading_style))
+    if 'ai_analysis' in context and context['ai_analysis'] and context['ai_analysis'].strip():
+        story.append(Paragraph("AI-Generated Business Analysis", S.heading))
         story.append(Spacer(1, 0.15*inch))
         
         # Convert markdown to formatted PDF elements
         analysis_text = context['ai_analysis']
-        formatted_elements = convert_markdown_to_reportlab(analysis_text, styles)
+        formatted_elements = convert_markdown_to_reportlab(analysis_text)
         story.extend(formatted_elements)
     
-    # Build PDF
-    doc.build(story)
-    print(f"Saved PDF report to {output_path}")
+    # Build PDF; page one (and so the preamble) needs at least one flowable
+    doc.build(story or [Spacer(1, 0)])
+    return _write_pdf(buf, output_path)
+
+# Limits for the AI-analysis slide
+_PPTX_MAX_BULLETS = 12
+_PPTX_BULLET_CHARS = 200
 
 def save_pptx_from_context(output_pptx: str, context: dict):
     """
@@ -320,9 +607,10 @@ def save_pptx_from_context(output_pptx: str, context: dict):
     title.text = context.get('title', 'TrendSpotter Report')
     subtitle.text = f"Generated: {context.get('generated_on', '')}"
     
+    bullet_slide_layout = prs.slide_layouts[1]
+    
     # Slide 2: File Information
     if 'file_info' in context:
-        bullet_slide_layout = prs.slide_layouts[1]
         slide = prs.slides.add_slide(bullet_slide_layout)
         shapes = slide.shapes
         
@@ -346,7 +634,6 @@ def save_pptx_from_context(output_pptx: str, context: dict):
     
     # Slide 3: Anomaly Summary
     if 'anomalies_summary' in context:
-        bullet_slide_layout = prs.slide_layouts[1]
         slide = prs.slides.add_slide(bullet_slide_layout)
         shapes = slide.shapes
         
@@ -362,8 +649,7 @@ def save_pptx_from_context(output_pptx: str, context: dict):
         p.text = f"Percentage: {context['anomalies_summary'].get('percentage', '0%')}"
     
     # Slide 4: AI Analysis
-    if 'ai_analysis' in context and context['ai_analysis']:
-        bullet_slide_layout = prs.slide_layouts[1]
+    if 'ai_analysis' in context and context['ai_analysis'] and context['ai_analysis'].strip():
         slide = prs.slides.add_slide(bullet_slide_layout)
         shapes = slide.shapes
         
@@ -373,25 +659,48 @@ def save_pptx_from_context(output_pptx: str, context: dict):
         title_shape.text = 'AI-Generated Analysis'
         
         tf = body_shape.text_frame
-        # Split analysis into chunks if too long
-        analysis_text = context['ai_analysis']
-        if len(analysis_text) > 500:
-            analysis_text = analysis_text[:500] + "..."
-        tf.text = analysis_text
+        # One bullet per markdown block, capped so the slide stays readable
+        blocks = _parse_markdown_blocks(context['ai_analysis'])[:_PPTX_MAX_BULLETS]
+        for i, block in enumerate(blocks):
+            p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+            text = block.text
+            if len(text) > _PPTX_BULLET_CHARS:
+                text = text[:_PPTX_BULLET_CHARS] + "..."
+            p.text = text
+            p.level = block.level
     
     # Save
     prs.save(output_pptx)
     print(f"Saved PPTX report to {output_pptx}")
 
+def export_all(context: dict, pdf_path: str, pptx_path: str, use_processes: bool = True):
+    """
+    Write the PDF and PPTX reports side by side. Both renderers are CPU-bound and
+    share nothing, so by default each gets its own process; inside a web worker
+    pass use_processes=False to use threads and skip the process start-up cost.
+    """
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_cls(max_workers=2) as ex:
+        pdf = ex.submit(save_pdf_from_context, context, pdf_path)
+        pptx = ex.submit(save_pptx_from_context, pptx_path, context)
+        pdf.result()
+        pptx.result()
+
 if __name__ == "__main__":
     context = {
       "title": "Campaign Report",
-      "generated_on": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-      "summary_table_html": pd.DataFrame([[1,2,3],[4,5,6]], columns=["A","B","C"]).to_html(index=False),
-      "anomalies_table_html": pd.DataFrame([[10, 'row1'], [20, 'row2']], columns=["score","row_id"]).to_html(index=False),
+      "generated_on": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+      "summary_table_html": (
+          '<table border="1" class="dataframe"><thead><tr><th>A</th><th>B</th><th>C</th></tr></thead>'
+          '<tbody><tr><td>1</td><td>2</td><td>3</td></tr><tr><td>4</td><td>5</td><td>6</td></tr></tbody></table>'
+      ),
+      "anomalies_table_html": (
+          '<table border="1" class="dataframe"><thead><tr><th>score</th><th>row_id</th></tr></thead>'
+          '<tbody><tr><td>10</td><td>row1</td></tr><tr><td>20</td><td>row2</td></tr></tbody></table>'
+      ),
       "ai_analysis": "<h2>AI Summary</h2><p>Some analysis text...</p>",
       "sample_table": [["Metric","Value"], ["Spend","$1000"], ["Clicks","300"]],
     }
     html = render_html_report(context, template_dir="templates", template_file="report_template.html")
     save_pdf_from_html(html, "report.pdf")
-    save_pptx_from_context("template.pptx", "report.pptx", context)
\ No newline at end of file
+    save_pptx_from_context("report.pptx", context)
\ No newline at end of file